@@ -21,6 +21,7 @@ from bpy.props import *
 import bpy
 import bmesh
 import math
+import itertools
 from mathutils.bvhtree import BVHTree
 
 # Version history
@@ -29,9 +30,11 @@ from mathutils.bvhtree import BVHTree
 # 1.0.2 - 2022-04-28: Added a comment about bl_options = {"REGISTER", "UNDO"}
 # 1.0.3 - 2022-06-22: Moved the add-on to a "Modeling" tab (it used to be in "Animation", which makes no sense).
 # 1.0.4 - 2022-08-07: Misc formatting cleanup before uploading to GitHub.
+# 1.1.0 - 2026-10-14: Sped up the search for a good offset.
 
 ###############################################################################
 SCRIPT_NAME = 'shrinkwrap_without_touching'
+DEBUG = False # Set to True to get the {'INFO'} reports about what the script is doing.
 
 # This Blender add-on creates (and possibly applies) a Shrinkwrap modifier at
 # the lowest possible setting so that it doesn't touch the object it's
@@ -40,10 +43,17 @@ SCRIPT_NAME = 'shrinkwrap_without_touching'
 # parameters in the add-on.
 ###############################################################################
 
+# The search for a good offset starts at OFFSET_START and doubles it (at most
+# MAX_DOUBLINGS times) until the objects stop touching, then bisects down to
+# within OFFSET_TOLERANCE of the lowest offset that doesn't touch.
+OFFSET_START = 0.01
+OFFSET_TOLERANCE = 0.0001
+MAX_DOUBLINGS = 12
+
 bl_info = {
     "name": "Shrinkwrap without Touching",
     "author": "Jeff Boller",
-    "version": (1, 0, 4),
+    "version": (1, 1, 0),
     "blender": (2, 93, 0),
     "location": "View3D > Properties > Modeling",
     "description": "Creates (and possibly applies) a Shrinkwrap modifier at the lowest possible setting so that it doesn't touch the object it's shrinkwrapped around.",
@@ -51,6 +61,39 @@ bl_info = {
     "tracker_url": "https://github.com/sundriftproductions/blenderaddon-shrinkwrap-without-touching",
     "category": "3D View"}
 
+def bounding_box(coords):
+    # Returns the (min, max) corners of the axis-aligned box around the coordinates,
+    # or None if there aren't any coordinates (e.g. a mesh with no vertices).
+    coords = list(coords)
+    if len(coords) == 0:
+        return None
+    bb_min = Vector((min(co[0] for co in coords), min(co[1] for co in coords), min(co[2] for co in coords)))
+    bb_max = Vector((max(co[0] for co in coords), max(co[1] for co in coords), max(co[2] for co in coords)))
+    return bb_min, bb_max
+
+def bounding_boxes_overlap(bb_now, bb_next):
+    # An empty mesh (no bounding box) can't overlap anything.
+    if bb_now is None or bb_next is None:
+        return False
+
+    # If the boxes are apart along any axis, they can't overlap.
+    for axis in range(3):
+        if bb_now[1][axis] < bb_next[0][axis] or bb_next[1][axis] < bb_now[0][axis]:
+            return False
+    return True
+
+def bvhtree_from_mesh(mesh, matrix):
+    # Build a BVH tree (and bounding box) of the mesh, transformed by the given matrix.
+    # The bmesh is only needed to build the tree, so free it right away (even if something goes wrong)
+    # instead of waiting on garbage collection.
+    bm = bmesh.new()
+    try:
+        bm.from_mesh(mesh)
+        bm.transform(matrix)
+        return BVHTree.FromBMesh(bm), bounding_box(v.co for v in bm.verts)
+    finally:
+        bm.free()
+
 def select_name( name = "", extend = True ):
     if extend == False:
         bpy.ops.object.select_all(action='DESELECT')
@@ -63,99 +106,151 @@ class SHRINKWRAPWITHOUTTOUCHING_PT_CreateShrinkwrapModifier(bpy.types.Operator):
     bl_label = "Create Shrinkwrap Modifier"
     bl_options = {"REGISTER", "UNDO"}  # Required for when we do a bpy.ops.ed.undo_push(), otherwise Blender will crash when you try to undo the action in this class.
 
-    def create_shrinkwrap_modifier(self, offset):
+    def create_shrinkwrap_modifier(self, active, target, prefs, offset):
         bpy.ops.object.modifier_add(type='SHRINKWRAP')
-        index = len(bpy.context.active_object.modifiers) - 1
-        bpy.context.active_object.modifiers[index].wrap_method = 'NEAREST_SURFACEPOINT'
-        bpy.context.active_object.modifiers[index].wrap_mode = 'OUTSIDE_SURFACE'
-        bpy.context.active_object.modifiers[index].target = bpy.data.objects[
-            bpy.context.preferences.addons['shrinkwrap_without_touching'].preferences.target_name]
-        if len(bpy.context.preferences.addons['shrinkwrap_without_touching'].preferences.vertex_group_name) > 0:
-            bpy.context.active_object.modifiers[index].vertex_group = bpy.context.preferences.addons['shrinkwrap_without_touching'].preferences.vertex_group_name
-            bpy.context.active_object.modifiers[index].invert_vertex_group = bpy.context.preferences.addons['shrinkwrap_without_touching'].preferences.invert_group_influence
-        bpy.context.active_object.modifiers[index].offset = offset
-        return index
-
-    def intersection_check(self, obj_list):
-        objectsTouching = False
-        # check every object for intersection with every other object
-        for obj_now in obj_list:
-            for obj_next in obj_list:
-                print()
-                if obj_now == obj_next:
-                    continue
-
-                # create bmesh objects
-                bm1 = bmesh.new()
-                bm2 = bmesh.new()
-
-                # fill bmesh data from objects
-                bm1.from_mesh(bpy.context.scene.objects[obj_now].data)
-                bm2.from_mesh(bpy.context.scene.objects[obj_next].data)
-
-                # fixed it here:
-                bm1.transform(bpy.context.scene.objects[obj_now].matrix_world)
-                bm2.transform(bpy.context.scene.objects[obj_next].matrix_world)
-
-                # make BVH tree from BMesh of objects
-                obj_now_BVHtree = BVHTree.FromBMesh(bm1)
-                obj_next_BVHtree = BVHTree.FromBMesh(bm2)
-
-                # get intersecting pairs
-                inter = obj_now_BVHtree.overlap(obj_next_BVHtree)
-
-                # if list is empty, no objects are touching
-                if inter != []:
-                    objectsTouching = True
-
-        return objectsTouching
+        modifier = active.modifiers[-1]
+        modifier.wrap_method = 'NEAREST_SURFACEPOINT'
+        modifier.wrap_mode = 'OUTSIDE_SURFACE'
+        modifier.target = target
+        if len(prefs.vertex_group_name) > 0:
+            modifier.vertex_group = prefs.vertex_group_name
+            modifier.invert_vertex_group = prefs.invert_group_influence
+        modifier.offset = offset
+        return modifier
+
+    def intersection_check(self, BVHtree_list):
+        # BVHtree_list holds a (BVH tree, bounding box) for each object. Check every BVH tree for intersection
+        # with every other BVH tree, each pair only once. (The operator only ever passes two objects, so
+        # there's just one pair; going through every combination is only there for more than two.)
+        for (obj_now_BVHtree, obj_now_bb), (obj_next_BVHtree, obj_next_bb) in itertools.combinations(BVHtree_list, 2):
+            # if the bounding boxes don't overlap, there's no need to walk the BVH trees
+            if not bounding_boxes_overlap(obj_now_bb, obj_next_bb):
+                continue
+
+            # get intersecting pairs; if the list isn't empty, these objects are touching
+            if obj_now_BVHtree.overlap(obj_next_BVHtree):
+                return True
+
+        return False
+
+    def offset_is_touching(self, active, modifier, offset, target_BVHtree, target_bb):
+        # Rather than applying the modifier (and undoing it afterwards), just let the depsgraph
+        # evaluate the shrinkwrap at this offset and check the resulting mesh.
+        modifier.offset = offset
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+
+        # The shrinkwrapped object changes with every offset, so its BVH tree has to be rebuilt.
+        # FromObject builds it straight from the evaluated mesh, in the object's local space.
+        active_BVHtree = BVHTree.FromObject(active, depsgraph)
+        active_bb = bounding_box(active.evaluated_get(depsgraph).bound_box)
+        touching = self.intersection_check([(active_BVHtree, active_bb), (target_BVHtree, target_bb)])
+
+        if DEBUG:
+            if touching:
+                self.report({'INFO'}, 'Intersecting with offset ' + str(offset))
+            else:
+                self.report({'INFO'}, 'NOT intersecting with offset ' + str(offset))
+
+        return touching
+
+    def apply_modifier(self, active, modifier):
+        mesh = active.data
+
+        # If the shrinkwrap is the only modifier (and nothing else uses the mesh or has shape keys on it),
+        # the evaluated mesh is exactly what applying it would give us, so skip bpy.ops.object.modifier_apply()
+        # and just swap in a copy of the evaluated mesh. With other modifiers in the stack, the evaluated
+        # mesh would have them baked in too, so let Blender apply it the normal way.
+        if len(active.modifiers) == 1 and mesh.users == 1 and mesh.shape_keys is None:
+            depsgraph = bpy.context.evaluated_depsgraph_get()
+            new_mesh = bpy.data.meshes.new_from_object(active.evaluated_get(depsgraph), preserve_all_data_layers=True, depsgraph=depsgraph)
+            active.modifiers.remove(modifier)
+            active.data = new_mesh
+            name = mesh.name
+            bpy.data.meshes.remove(mesh)
+            new_mesh.name = name
+        else:
+            bpy.ops.object.modifier_apply(modifier=modifier.name, report=True)
+
+    def find_offset(self, active, modifier, target_BVHtree, target_bb):
+        # Returns the lowest offset (within OFFSET_TOLERANCE) that doesn't touch the target, or None if there isn't one.
+        # There's no point in checking an offset of 0: at 0, the shrinkwrap puts the vertices right on
+        # the target's surface, so they're always touching. That makes 0 where the search starts from.
+        # (That's also why the offset isn't worked out straight from vertex-to-surface distances: with the
+        # vertices on the surface, what touches is the faces in between them, which those distances can't see.)
+        # Keep doubling the offset until we find one that doesn't touch...
+        lo = 0
+        hi = OFFSET_START
+        doublings = 0
+        while self.offset_is_touching(active, modifier, hi, target_BVHtree, target_bb):
+            doublings += 1
+            if doublings >= MAX_DOUBLINGS:
+                return None
+            lo = hi
+            hi *= 2
+
+        # ...then bisect between the last offset that touched and the first one that didn't.
+        while hi - lo > OFFSET_TOLERANCE:
+            mid = (lo + hi) / 2
+            if self.offset_is_touching(active, modifier, mid, target_BVHtree, target_bb):
+                lo = mid
+            else:
+                hi = mid
+        return hi
 
     def execute(self, context):
-        self.report({'INFO'}, '**********************************')
-        self.report({'INFO'}, SCRIPT_NAME + ' - START')
-
-        mode = bpy.context.active_object.mode
-        bpy.ops.object.mode_set(mode='OBJECT')
+        if DEBUG:
+            self.report({'INFO'}, '**********************************')
+            self.report({'INFO'}, SCRIPT_NAME + ' - START')
 
-        offset = 0
+        # Look these up once rather than going through bpy every time we need them.
+        prefs = bpy.context.preferences.addons[SCRIPT_NAME].preferences
+        active = bpy.context.active_object
+        target = bpy.data.objects[prefs.target_name]
 
-        obj_list = [bpy.context.active_object.name, bpy.data.objects[bpy.context.preferences.addons['shrinkwrap_without_touching'].preferences.target_name].name]
-
-        iterations = 0
-        foundGoodOffset = False
-
-        while iterations < 20:
-            iterations += 1
+        mode = active.mode
+        bpy.ops.object.mode_set(mode='OBJECT')
 
-            index = self.create_shrinkwrap_modifier(offset)
+        # The target doesn't change while we search for an offset, so only build its BVH tree once.
+        # It's built in the shrinkwrapped object's local space to match the trees from BVHTree.FromObject().
+        # (Whether two meshes intersect doesn't depend on which space we check them in.)
+        # inverted_safe() so an object scaled to 0 along some axis doesn't make this blow up.
+        target_BVHtree, target_bb = bvhtree_from_mesh(target.data, active.matrix_world.inverted_safe() @ target.matrix_world)
 
-            bpy.ops.ed.undo_push() # Manually record that when we do an undo, we want to go back to this exact state.
-            bpy.ops.object.modifier_apply(modifier=bpy.context.active_object.modifiers[index].name, report=True)
+        # Only add the modifier once; we'll just change its offset while searching.
+        modifier = self.create_shrinkwrap_modifier(active, target, prefs, 0)
 
-            if not self.intersection_check(obj_list):
-                foundGoodOffset = True
-                self.report({'INFO'}, 'NOT intersecting -- found good offset: ' + str(offset))
-                bpy.ops.ed.undo()
-                break
-            else:
-                offset += 0.01
-                self.report({'INFO'}, 'Intersecting -- going to try with offset ' + str(offset))
-                bpy.ops.ed.undo()
+        # If the shrinkwrap is going to be applied, Blender applies it to the original mesh, without any
+        # other modifiers in the stack. Hide those while searching so we check exactly what gets applied.
+        hidden_modifiers = []
+        if prefs.apply_shrinkwrap:
+            hidden_modifiers = [m for m in active.modifiers if m != modifier and m.show_viewport]
+        for m in hidden_modifiers:
+            m.show_viewport = False
 
-        if foundGoodOffset:
-            index = self.create_shrinkwrap_modifier(offset)
-            if bpy.context.preferences.addons['shrinkwrap_without_touching'].preferences.apply_shrinkwrap:
+        try:
+            offset = self.find_offset(active, modifier, target_BVHtree, target_bb)
+        finally:
+            for m in hidden_modifiers:
+                m.show_viewport = True
+
+        if offset is not None:
+            if DEBUG:
+                self.report({'INFO'}, 'Found good offset: ' + str(offset))
+            modifier.offset = offset
+            if prefs.apply_shrinkwrap:
                 bpy.ops.ed.undo_push()  # Manually record that when we do an undo, we want to go back to this exact state.
-                bpy.ops.object.modifier_apply(modifier=bpy.context.active_object.modifiers[index].name, report=True)
+                self.apply_modifier(active, modifier)
         else:
+            active.modifiers.remove(modifier)
             self.report({'ERROR'}, 'Could not find good offset.')
 
         # Go back to whatever mode we were in.
         bpy.ops.object.mode_set(mode=mode)
 
-        self.report({'INFO'}, SCRIPT_NAME + ' - END')
-        self.report({'INFO'}, '**********************************')
-        self.report({'INFO'}, 'Done running script ' + SCRIPT_NAME)
+        if DEBUG:
+            self.report({'INFO'}, SCRIPT_NAME + ' - END')
+            self.report({'INFO'}, '**********************************')
+            self.report({'INFO'}, 'Done running script ' + SCRIPT_NAME)
 
         return {'FINISHED'}
 
@@ -177,6 +272,8 @@ class SHRINKWRAPWITHOUTTOUCHING_PT_Main(bpy.types.Panel):
     bl_category = "Modeling"
 
     def draw(self, context):
+        prefs = bpy.context.preferences.addons[SCRIPT_NAME].preferences
+
         row = self.layout.row(align=True)
         row.label(text="Object that will get Shrinkwrap modifier:")
         row = self.layout.row(align=True)
@@ -190,19 +287,19 @@ class SHRINKWRAPWITHOUTTOUCHING_PT_Main(bpy.types.Panel):
         row.label(text=name)
 
         row = self.layout.row(align=True)
-        row.prop_search(bpy.context.preferences.addons['shrinkwrap_without_touching'].preferences, "target_name", bpy.data, "objects", icon='OBJECT_DATA')
+        row.prop_search(prefs, "target_name", bpy.data, "objects", icon='OBJECT_DATA')
 
         row = self.layout.row(align=True)
 
         try:
-            row.prop_search(bpy.context.preferences.addons['shrinkwrap_without_touching'].preferences, "vertex_group_name", bpy.context.active_object, "vertex_groups", icon='GROUP_VERTEX')
+            row.prop_search(prefs, "vertex_group_name", bpy.context.active_object, "vertex_groups", icon='GROUP_VERTEX')
         except:
             pass
 
-        row.prop(bpy.context.preferences.addons['shrinkwrap_without_touching'].preferences, "invert_group_influence", icon='ARROW_LEFTRIGHT')
+        row.prop(prefs, "invert_group_influence", icon='ARROW_LEFTRIGHT')
 
         row = self.layout.row(align=True)
-        row.prop(bpy.context.preferences.addons['shrinkwrap_without_touching'].preferences, "apply_shrinkwrap")
+        row.prop(prefs, "apply_shrinkwrap")
 
         row = self.layout.row(align=True)
         row = self.layout.row(align=True)